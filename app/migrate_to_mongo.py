@@ -27,11 +27,17 @@ Usage (examples):
 
 """
 import argparse
+import csv
+import functools
+import multiprocessing
 import os
 import sys
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from typing import Dict, Iterable, List, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timezone
 
 # Optional .env support (won't fail if not installed)
 try:
@@ -40,14 +46,23 @@ try:
 except Exception:
     pass
 
+import bson
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from bson.raw_bson import RawBSONDocument
+from pandas._libs.parsers import STR_NA_VALUES
 from pymongo import MongoClient, UpdateOne
 from pymongo.errors import BulkWriteError
 
 __REQUIREMENTS__ = [
+    "numpy>=1.22.4,<3",
     "pandas>=2.0,<3",
+    "pyarrow>=15,<22",
     "pymongo>=4.6,<5",
     "python-dotenv>=1.0,<2",
+    "zstandard>=0.20",
 ]
 
 EXPECTED_COLUMNS = [
@@ -68,6 +83,15 @@ EXPECTED_COLUMNS = [
     "Test Results",
 ]
 
+# Date layouts tried, in order, for the vectorized parse (day first, then ISO)
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d")
+
+# Format detected for each date column on its first value, reused for the run
+_date_formats: Dict[str, str] = {}
+
+# Arrow-backed strings: pandas .str methods run as Arrow compute kernels
+ARROW_STRING = pd.StringDtype("pyarrow")
+
 NATURAL_KEY_FIELDS = [  # normalized field names used in Mongo
     "name",
     "gender",
@@ -75,6 +99,16 @@ NATURAL_KEY_FIELDS = [  # normalized field names used in Mongo
     "date_of_admission",
     "hospital",
 ]
+_natural_key = itemgetter(*NATURAL_KEY_FIELDS)
+UNIQUE_INDEX_NAME = "uniq_admission"
+
+# A document pre-encoded to BSON: (natural key, document or $set payload,
+# upsert filter or None, timestamp of the chunk it was built from)
+EncodedDoc = Tuple[Tuple, RawBSONDocument, Optional[RawBSONDocument], datetime]
+
+# Server limit on operations per write command (MongoDB >= 3.6 advertises
+# 100000 in `hello`); larger batches get re-split by the driver.
+DEFAULT_MAX_WRITE_BATCH_SIZE = 100_000
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Migrate healthcare CSV into MongoDB with idempotent upserts.")
@@ -90,22 +124,44 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--collection", dest="collection_name", required=False,
                         default=os.environ.get("MONGO_COLLECTION", "patients"),
                         help="Mongo collection name (or env MONGO_COLLECTION).")
+    parser.add_argument("--compressors", dest="compressors",
+                        default=os.environ.get("MONGO_COMPRESSORS"),
+                        help="Wire compressors in order of preference (or env MONGO_COMPRESSORS); "
+                             "'zstd,zlib' is recommended, 'zlib' for servers without zstd (< 4.2). "
+                             "Unset: the URI's compressors= option, if any, applies.")
+    parser.add_argument("--write-concern", dest="write_concern", type=int, choices=[0, 1], default=None,
+                        help="Override the write concern for the load: 1 = acknowledged without journal "
+                             "wait, 0 = unacknowledged (fastest; counts in the report become 'sent'). "
+                             "Both disable retryable writes. Default: URI/server settings.")
     parser.add_argument("--batch-size", dest="batch_size", type=int, default=1000,
-                        help="Batch size for bulk operations.")
+                        help="Batch size for bulk operations (capped at the server's maxWriteBatchSize).")
+    parser.add_argument("--workers", dest="workers", type=int, default=4,
+                        help="Bulk write batches kept in flight concurrently (1 = sequential).")
     parser.add_argument("--chunksize", dest="chunksize", type=int, default=5000,
-                        help="Read the CSV in chunks of this many rows (streaming).")
+                        help="Transform the CSV in chunks of this many rows (streaming).")
+    parser.add_argument("--processes", dest="processes", type=int, default=1,
+                        help="Parse/transform the CSV in this many worker processes "
+                             "(requires no line breaks inside quoted fields).")
+    parser.add_argument("--block-size", dest="block_size", type=int, default=8 << 20,
+                        help="Bytes of CSV parsed per Arrow block, and upper bound of each "
+                             "--processes byte range (default 8 MiB).")
     parser.add_argument("--dry-run", dest="dry_run", action="store_true",
                         help="Validate and transform, but do not write to MongoDB.")
     parser.add_argument("--print-requirements", action="store_true",
                         help="Print pip requirements and exit.")
     parser.add_argument("--create-indexes", dest="create_indexes", action="store_true",
-                        help="Create unique compound index for idempotent upserts.")
+                        help="Create unique compound index for idempotent upserts "
+                             "(before the load when upserting, after it otherwise).")
     # Upsert flags (default True)
     upsert_group = parser.add_mutually_exclusive_group()
     upsert_group.add_argument("--upsert", dest="upsert", action="store_true", default=True,
                               help="Use upsert mode (default).")
     upsert_group.add_argument("--no-upsert", dest="upsert", action="store_false",
                               help="Disable upsert; perform plain inserts.")
+    upsert_group.add_argument("--load-then-index", dest="load_then_index", action="store_true",
+                              help="Plain inserts, then build the unique index after the load "
+                                   "(first load only: falls back to upserts if the collection "
+                                   "already holds documents).")
     parser.add_argument("--report-path",dest="report_path",default=os.environ.get("REPORT_PATH"),
                         help="Path for report.txt",)
     parser.add_argument("--log-level", dest="log_level", default=os.environ.get("LOG_LEVEL","INFO"),
@@ -126,112 +182,312 @@ def validate_columns(columns: List[str]) -> None:
     if extra:
         logging.warning("Extra columns present and will be ignored: %s", extra)
 
-def coerce_string(val) -> Optional[str]:
-    if pd.isna(val):
-        return None
-    s = str(val).strip()
-    return s if s != "" else None
-
-def normalize_lower(val) -> Optional[str]:
-    s = coerce_string(val)
-    return s.lower() if s else None
-
-def coerce_int(val) -> Optional[int]:
-    if pd.isna(val) or val == "":
-        return None
-    try:
-        return int(float(val))
-    except Exception:
-        return None
+def utcnow() -> datetime:
+    """Naive UTC timestamp (as stored in Mongo); datetime.utcnow() is deprecated."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
-def coerce_float(val) -> Optional[float]:
-    if pd.isna(val) or val == "":
-        return None
-    try:
-        if isinstance(val, str):
-            val = val.replace(",", "")
-        return float(val)
-    except Exception:
-        return None
+def _is_empty(val) -> bool:
+    """Missing-value test for scalars: None, pd.NA, NaN (the only value not
+       equal to itself) or the empty string. Cheaper than pd.isna() per call."""
+    return val is None or val is pd.NA or val != val or val == ""
 
 def coerce_date(val) -> Optional[datetime]:
     """Parse to datetime and normalize to date-only (00:00:00)."""
-    if pd.isna(val) or val == "":
+    if _is_empty(val):
         return None
+    return _parse_date(str(val))
+
+@functools.lru_cache(maxsize=65536)
+def _parse_date(val: str) -> Optional[datetime]:
+    # Memoized: a dataset only spans a few thousand distinct dates.
+    # Known layouts go through strptime; pandas' format sniffing is the last resort.
+    for fmt in DATE_FORMATS:
+        try:
+            dt = datetime.strptime(val, fmt)
+        except ValueError:
+            continue
+        # strptime accepts years a datetime64[ns] column cannot hold (e.g. 1500)
+        return dt if pd.Timestamp.min <= dt <= pd.Timestamp.max else None
     dt = pd.to_datetime(val, dayfirst=True, errors="coerce")
-    if pd.isna(dt):
+    if dt is pd.NaT:
         return None
     py = dt.to_pydatetime().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
     return py
 
-def transform_row(row: pd.Series) -> Optional[Dict]:
-    """Map CSV row to MongoDB document with normalized types/case.
-       Returns None if the natural-key fields are missing (skips row)."""
-    name = normalize_lower(row.get("Name"))
-    gender = normalize_lower(row.get("Gender"))
-    blood_type = normalize_lower(row.get("Blood Type"))
-    hospital = normalize_lower(row.get("Hospital"))
-    doa = coerce_date(row.get("Date of Admission"))
-
-    # If any natural key field is missing, skip to avoid index errors
-    if not all([name, gender, blood_type, hospital, doa]):
-        logging.warning("Skipping row with incomplete natural key: %s", {
-            "name": name, "gender": gender, "blood_type": blood_type, "date_of_admission": doa, "hospital": hospital
-        })
+def _text(col: pd.Series) -> pd.Series:
+    """Trimmed string column; blank cells become missing."""
+    return col.astype(ARROW_STRING).str.strip().replace("", pd.NA)
+
+@functools.lru_cache(maxsize=65536)
+def _intern(val: str, lower: bool) -> str:
+    # Shared across chunks: a value seen before returns the same str object
+    return sys.intern(val.lower() if lower else val)
+
+def _interned(col: pd.Series, lower: bool = False) -> pd.Series:
+    """Text column for fields with repeated values (hospital, doctor, ...).
+       Each distinct value is normalized once per chunk and deduplicated
+       through _intern(), so repeats share a single str object."""
+    text = _text(col)
+    codes, uniques = pd.factorize(text)
+    if 2 * len(uniques) > len(codes):
+        # Mostly distinct values (e.g. hospitals in a small extract): nothing
+        # to share, the vectorized string kernels are cheaper
+        return text.str.lower() if lower else text
+    table = np.array([_intern(u, lower) for u in uniques] + [None], dtype=object)
+    return pd.Series(table[codes], index=col.index, dtype=object)
+
+def _numbers(col: pd.Series, strip_commas: bool = False) -> pd.Series:
+    """Numeric column as float64 (NaN for missing/unparseable)."""
+    text = _text(col)
+    if strip_commas:
+        text = text.str.replace(",", "", regex=False)
+    return pd.to_numeric(text, errors="coerce").astype("float64")
+
+def _guess_date_format(text: pd.Series) -> Optional[str]:
+    """First of DATE_FORMATS that parses the column's first value. Passing an
+       explicit format stops pandas from inferring "%Y-%d-%m" for ISO dates
+       under dayfirst=True, and skips its per-chunk format inference."""
+    fmt = _date_formats.get(text.name)
+    if fmt:
+        return fmt
+    sample = text.dropna()
+    if sample.empty:
         return None
-
-    now = datetime.utcnow()
-    doc = {
-        "name": name,
-        "age": coerce_int(row.get("Age")),
-        "gender": gender,
-        "blood_type": blood_type,
-        "medical_condition": coerce_string(row.get("Medical Condition")),
-        "date_of_admission": doa,
-        "doctor": coerce_string(row.get("Doctor")),
-        "hospital": hospital,
-        "insurance_provider": coerce_string(row.get("Insurance Provider")),
-        "billing_amount": coerce_float(row.get("Billing Amount")),
-        "room_number": coerce_string(row.get("Room Number")),
-        "admission_type": coerce_string(row.get("Admission Type")),
-        "discharge_date": coerce_date(row.get("Discharge Date")),
-        "medication": coerce_string(row.get("Medication")),
-        "test_results": coerce_string(row.get("Test Results")),
-        # Operational metadata
-        "ingested_at": now,
-        "last_modified_at": now,
-        "source": "csv_migration_v2",
+    for fmt in DATE_FORMATS:
+        try:
+            datetime.strptime(sample.iloc[0], fmt)
+        except ValueError:
+            continue
+        _date_formats[text.name] = fmt
+        return fmt
+    return None
+
+def _dates(col: pd.Series) -> pd.Series:
+    """Parse a whole date column (dayfirst) and normalize to date-only.
+       Values the vectorized parser rejects go through coerce_date(), once per
+       distinct string, so a chunk mixing several date formats still parses."""
+    text = _text(col)
+    fmt = _guess_date_format(text)
+    if fmt:
+        parsed = pd.to_datetime(text, format=fmt, errors="coerce")
+    else:
+        parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    retry = parsed.isna() & text.notna()
+    if retry.any():
+        pending = text[retry]
+        fallback = {v: coerce_date(v) for v in pending.unique()}
+        parsed[retry] = pd.to_datetime(pending.map(fallback).astype(object), errors="coerce")
+    return parsed.dt.normalize()
+
+def _to_list(col: pd.Series) -> list:
+    """Plain Python values of a column, with None for missing."""
+    if pd.api.types.is_datetime64_any_dtype(col):
+        values = pd.DatetimeIndex(col).tz_localize(None).to_pydatetime()
+    else:
+        values = col.to_numpy(dtype=object)
+    values[col.isna().to_numpy()] = None
+    return values.tolist()
+
+def transform_chunk(chunk: pd.DataFrame, upsert: bool = False) -> List[EncodedDoc]:
+    """Map a CSV chunk to BSON-encoded MongoDB documents with normalized
+       types/case. Columns are normalized as a whole, then a single pass over
+       the rows builds, validates and encodes each document; rows missing a
+       natural-key field are skipped.
+       With `upsert`, the payload is the $set part: ingested_at is left out
+       (bulk_write sets it via $setOnInsert, from the same chunk timestamp as
+       last_modified_at) and the natural-key filter is
+       encoded too, so retries resend the same bytes."""
+    age = _numbers(chunk["Age"])
+    age = np.trunc(age.where(np.isfinite(age))).astype("Int64")
+    columns = {
+        "name": _text(chunk["Name"]).str.lower(),
+        "age": age,
+        "gender": _interned(chunk["Gender"], lower=True),
+        "blood_type": _interned(chunk["Blood Type"], lower=True),
+        "medical_condition": _interned(chunk["Medical Condition"]),
+        "date_of_admission": _dates(chunk["Date of Admission"]),
+        "doctor": _interned(chunk["Doctor"]),
+        "hospital": _interned(chunk["Hospital"], lower=True),
+        "insurance_provider": _interned(chunk["Insurance Provider"]),
+        "billing_amount": _numbers(chunk["Billing Amount"], strip_commas=True),
+        "room_number": _text(chunk["Room Number"]),
+        "admission_type": _interned(chunk["Admission Type"]),
+        "discharge_date": _dates(chunk["Discharge Date"]),
+        "medication": _interned(chunk["Medication"]),
+        "test_results": _interned(chunk["Test Results"]),
     }
-    return doc
+    fields = list(columns)
+    values = [_to_list(col) for col in columns.values()]
 
-def natural_key_tuple(doc: Dict) -> Tuple:
-    return (doc["name"], doc["gender"], doc["blood_type"], doc["date_of_admission"], doc["hospital"])
+    # Operational metadata: one timestamp per chunk
+    now = utcnow()
+    metadata = {"last_modified_at": now, "source": "csv_migration_v2"}
+    if not upsert:
+        metadata = {"ingested_at": now, **metadata}
+
+    encoded = []
+    for row in zip(*values):
+        doc = dict(zip(fields, row))
+        key = _natural_key(doc)
+        # If any natural key field is missing, skip to avoid index errors
+        if None in key:
+            logging.warning("Skipping row with incomplete natural key: %s", dict(zip(NATURAL_KEY_FIELDS, key)))
+            continue
+        doc.update(metadata)
+        filt = RawBSONDocument(bson.encode(dict(zip(NATURAL_KEY_FIELDS, key)))) if upsert else None
+        encoded.append((key, RawBSONDocument(bson.encode(doc)), filt, now))
+    return encoded
+
+def _csv_convert_options() -> pacsv.ConvertOptions:
+    # Only the expected columns are converted (extras are skipped by the
+    # parser). Each is read as a string so that dirty cells are coerced by
+    # transform_chunk() instead of failing the whole read. pandas' default
+    # null markers are used: Arrow's own set lacks "None" and "<NA>".
+    return pacsv.ConvertOptions(
+        include_columns=EXPECTED_COLUMNS,
+        column_types={c: pa.string() for c in EXPECTED_COLUMNS},
+        null_values=sorted(STR_NA_VALUES),
+        strings_can_be_null=True,
+    )
 
-def iter_documents(csv_path: str, chunksize: int, stats: Dict) -> Iterable[List[Dict]]:
-    first = True
-    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
-        if first:
-            validate_columns(list(chunk.columns))
-            first = False
+class _InvalidRows:
+    """invalid_row_handler for Arrow's CSV parser: logs and skips rows with
+       the wrong number of fields instead of failing the whole read."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, row) -> str:
+        self.count += 1
+        logging.warning("Skipping malformed CSV row (expected %d fields, got %d): %s",
+                        row.expected_columns, row.actual_columns, row.text)
+        return "skip"
+
+    def take(self) -> int:
+        """Rows skipped since the previous call."""
+        n, self.count = self.count, 0
+        return n
+
+def read_csv_header(csv_path: str) -> Tuple[List[str], int]:
+    """Column names of the CSV and the byte offset of its first data row."""
+    with open(csv_path, "rb") as f:
+        names = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        return names, f.tell()
+
+def _batch_chunks(batch, chunksize: int) -> Iterable[pd.DataFrame]:
+    """Slice an Arrow record batch into pandas chunks of at most `chunksize` rows."""
+    for offset in range(0, batch.num_rows, chunksize):
+        part = batch.slice(offset, chunksize)
+        yield part.to_pandas(types_mapper={pa.string(): ARROW_STRING}.get)
+
+def iter_csv_chunks(csv_path: str, chunksize: int, block_size: int,
+                    invalid: Optional[_InvalidRows] = None) -> Iterable[pd.DataFrame]:
+    """Stream the CSV with Arrow's block parser and yield pandas chunks of at
+       most `chunksize` rows. Malformed rows are skipped and counted in `invalid`."""
+    validate_columns(read_csv_header(csv_path)[0])
+    reader = pacsv.open_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(block_size=block_size, use_threads=True),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=invalid or _InvalidRows()),
+        convert_options=_csv_convert_options(),
+    )
+    for batch in reader:
+        yield from _batch_chunks(batch, chunksize)
+
+def split_csv(csv_path: str, parts: int, block_size: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Return the header names and contiguous byte ranges covering the data
+       rows, each ending on a line boundary: at least `parts` ranges (one per
+       worker) of at most ~`block_size` bytes.
+       Assumes no quoted field spans several lines."""
+    names, start = read_csv_header(csv_path)
+    size = os.path.getsize(csv_path)
+    step = max(1, min(block_size, -(-(size - start) // max(1, parts))))
+    ranges = []
+    with open(csv_path, "rb") as f:
+        while start < size:
+            f.seek(min(start + step, size))
+            f.readline()
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return names, ranges
+
+def _transform_range(task: Tuple[str, List[str], int, int, int, bool]) -> List[Tuple[int, int, List[EncodedDoc]]]:
+    """Pool worker: parse, transform and encode one byte range of the CSV.
+       Returns (rows read, malformed rows skipped, encoded documents) per chunk."""
+    csv_path, names, start, end, chunksize, upsert = task
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    invalid = _InvalidRows()
+    table = pacsv.read_csv(
+        pa.py_buffer(data),
+        read_options=pacsv.ReadOptions(column_names=names, use_threads=False),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=invalid),
+        convert_options=_csv_convert_options(),
+    )
+    results = [
+        (len(chunk), 0, transform_chunk(chunk, upsert))
+        for batch in table.to_batches()
+        for chunk in _batch_chunks(batch, chunksize)
+    ]
+    return [(0, invalid.take(), [])] + results if invalid.count else results
+
+def _iter_transformed(csv_path: str, chunksize: int, block_size: int, processes: int,
+                      upsert: bool) -> Iterable[Tuple[int, int, List[EncodedDoc]]]:
+    """Yield (rows read, malformed rows skipped, encoded documents) per chunk,
+       in file order."""
+    if processes <= 1:
+        invalid = _InvalidRows()
+        for chunk in iter_csv_chunks(csv_path, chunksize, block_size, invalid):
+            yield len(chunk), invalid.take(), transform_chunk(chunk, upsert)
+        if invalid.count:
+            yield 0, invalid.take(), []
+        return
+    names, ranges = split_csv(csv_path, processes, block_size)
+    validate_columns(names)
+    tasks = [(csv_path, names, start, end, chunksize, upsert) for start, end in ranges]
+    # Spawned, not forked: by the time the pool starts, MongoClient has
+    # background monitor threads that a forked child would inherit half-copied.
+    ctx = multiprocessing.get_context("spawn")
+    level = logging.getLevelName(logging.getLogger().getEffectiveLevel())
+    # imap (not imap_unordered) keeps file order, so the first occurrence of a
+    # duplicate key wins exactly as in a sequential run.
+    with ctx.Pool(processes, initializer=setup_logging, initargs=(level,)) as pool:
+        for results in pool.imap(_transform_range, tasks):
+            yield from results
+
+def iter_documents(csv_path: str, chunksize: int, stats: Dict, block_size: int = 8 << 20,
+                   processes: int = 1, upsert: bool = True) -> Iterable[List[EncodedDoc]]:
+    """Yield batches of BSON-encoded documents (see transform_chunk()),
+       skipping natural keys already seen in this run."""
+    for rows, invalid, encoded in _iter_transformed(csv_path, chunksize, block_size, processes, upsert):
+        stats["total_rows"] += rows + invalid
+        stats["invalid_rows"] += invalid
+        stats["missing_key_rows"] += rows - len(encoded)
         docs = []
-        for _, row in chunk.iterrows():
-            stats["total_rows"] += 1
-            d = transform_row(row)
-            if d is None:
-                stats["missing_key_rows"] += 1
-                continue
-            key = natural_key_tuple(d)
+        for item in encoded:
+            key = item[0]
             if key in stats["seen_keys"]:
                 stats["duplicate_key_rows"] += 1
                 # Skip duplicates to avoid redundant upserts in this run
                 continue
             stats["seen_keys"].add(key)
-            docs.append(d)
+            docs.append(item)
         if docs:
             yield docs
 
-def get_collection(mongo_uri: str, db_name: str, collection_name: str):
-    client = MongoClient(mongo_uri)
+def get_collection(mongo_uri: str, db_name: str, collection_name: str, write_concern: Optional[int] = None,
+                   compressors: Optional[str] = None):
+    options = {}
+    if compressors:
+        # Negotiated with the server; unsupported entries are skipped
+        options.update(compressors=compressors, zlibCompressionLevel=3)
+    if write_concern is not None:
+        # Bulk-load profile: no journal wait and no retried writes; the CSV
+        # stays on disk, so a lost batch is recovered by rerunning.
+        options.update(w=write_concern, journal=False, retryWrites=False)
+    client = MongoClient(mongo_uri, **options)
     db = client[db_name]
     return db[collection_name]
 
@@ -245,57 +501,91 @@ def ensure_unique_index(collection) -> None:
         ("hospital", 1),
     ]
     try:
-        name = collection.create_index(idx_spec, unique=True, name="uniq_admission")
+        name = collection.create_index(idx_spec, unique=True, name=UNIQUE_INDEX_NAME)
         logging.info("Ensured unique index: %s", name)
     except Exception as e:
         logging.error("Failed to create index: %s", e)
         raise
 
-def bulk_write(collection, docs: List[Dict], upsert: bool) -> int:
+def max_write_batch_size(collection) -> int:
+    """Largest number of operations the server accepts in one write command."""
+    try:
+        hello = collection.database.client.admin.command("hello")
+        return int(hello.get("maxWriteBatchSize", DEFAULT_MAX_WRITE_BATCH_SIZE))
+    except Exception as e:
+        logging.debug("Could not read maxWriteBatchSize, assuming %d: %s", DEFAULT_MAX_WRITE_BATCH_SIZE, e)
+        return DEFAULT_MAX_WRITE_BATCH_SIZE
+
+def bulk_write(collection, docs: List[EncodedDoc], upsert: bool) -> int:
     if not docs:
         return 0
     if not upsert:
         try:
-            res = collection.insert_many(docs, ordered=False)
-            return len(res.inserted_ids)
+            # Raw documents carry no client-side _id (the server assigns one),
+            # so inserted_ids stays empty: count the batch instead.
+            collection.insert_many([raw for _, raw, _, _ in docs], ordered=False)
+            return len(docs)
         except BulkWriteError as bwe:
             logging.error("Bulk write error (insert): %s", bwe.details)
-            return len(bwe.details.get("writeErrors", []))
-
-    ops = []
-    for d in docs:
-        filt = {k: d[k] for k in ["name", "gender", "blood_type", "date_of_admission", "hospital"]}
-        set_fields = d.copy()
-        set_fields.pop("ingested_at", None)
-        set_fields["last_modified_at"] = datetime.utcnow()
-        ops.append(UpdateOne(filt, {"$set": set_fields, "$setOnInsert": {"ingested_at": d.get("ingested_at")}}, upsert=True))
+            # Unordered: every document without a write error was inserted
+            return bwe.details.get("nInserted", 0)
+
+    ops = [None] * len(docs)
+    for i, (_, set_fields, filt, stamped_at) in enumerate(docs):
+        # stamped_at is the payload's last_modified_at: both match on insert
+        ops[i] = UpdateOne(filt, {"$set": set_fields, "$setOnInsert": {"ingested_at": stamped_at}}, upsert=True)
     try:
         res = collection.bulk_write(ops, ordered=False)
+        if not res.acknowledged:  # w=0: counts unknown, report what was sent
+            return len(ops)
         return (res.upserted_count or 0) + (res.modified_count or 0)
     except BulkWriteError as bwe:
         logging.error("Bulk write error (upsert): %s", bwe.details)
         return 0
 
-def insert_or_upsert(collection, docs_iter: Iterable[List[Dict]], batch_size: int, upsert: bool) -> int:
+def insert_or_upsert(collection, docs_iter: Iterable[List[EncodedDoc]], batch_size: int, upsert: bool,
+                     workers: int = 1) -> int:
+    # Flush at the server's write-batch ceiling so the driver never has to
+    # re-buffer and split an oversized batch into several commands.
+    limit = max_write_batch_size(collection)
+    if batch_size > limit:
+        logging.warning("Batch size %d exceeds server maxWriteBatchSize; using %d.", batch_size, limit)
+        batch_size = limit
+    # Up to `workers` batches are in flight: pymongo releases the GIL on socket
+    # I/O, so the next batch is built and encoded while earlier ones are on the
+    # wire. Batches never share a natural key (duplicates are dropped upstream),
+    # so their completion order does not matter.
+    workers = max(1, workers)
     total = 0
-    buffer: List[Dict] = []
-    for docs in docs_iter:
-        for d in docs:
-            buffer.append(d)
-            if len(buffer) >= batch_size:
-                total += bulk_write(collection, buffer, upsert=upsert)
-                buffer.clear()
-    if buffer:
-        total += bulk_write(collection, buffer, upsert=upsert)
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(batch: List[EncodedDoc]) -> None:
+            nonlocal total
+            if len(in_flight) >= workers:
+                total += in_flight.popleft().result()
+            in_flight.append(executor.submit(bulk_write, collection, batch, upsert))
+
+        buffer: List[EncodedDoc] = []
+        for docs in docs_iter:
+            for d in docs:
+                buffer.append(d)
+                if len(buffer) >= batch_size:
+                    submit(buffer)
+                    buffer = []
+        if buffer:
+            submit(buffer)
+        while in_flight:
+            total += in_flight.popleft().result()
     return total
 
 def append_report(report_path: str, csv_path: str, stats: Dict, written: int) -> None:
-    ts = datetime.utcnow().isoformat(timespec="seconds") + "Z"
+    ts = utcnow().isoformat(timespec="seconds") + "Z"
     line = (
         f"[{ts}] csv={os.path.basename(csv_path)} "
         f"total_rows={stats['total_rows']} "
         f"duplicates_in_csv={stats['duplicate_key_rows']} "
         f"missing_key_rows={stats['missing_key_rows']} "
+        f"invalid_rows={stats['invalid_rows']} "
         f"upserted_or_modified={written}\n"
     )
     os.makedirs(os.path.dirname(report_path), exist_ok=True)
@@ -320,32 +610,63 @@ def main():
     stats = {
         "total_rows": 0,
         "missing_key_rows": 0,
+        "invalid_rows": 0,
         "duplicate_key_rows": 0,
         "seen_keys": set(),  # Set[Tuple]
     }
 
-    docs_iter = iter_documents(args.csv_path, chunksize=args.chunksize, stats=stats)
-
     if args.dry_run:
+        docs_iter = iter_documents(args.csv_path, chunksize=args.chunksize, stats=stats,
+                                   block_size=args.block_size, processes=args.processes, upsert=False)
         try:
             first_batch = next(docs_iter)
         except StopIteration:
             logging.warning("CSV appears empty; nothing to preview.")
             sys.exit(0)
-        preview = first_batch[:5]
+        preview = [bson.decode(raw.raw) for _, raw, _, _ in first_batch[:5]]
         import json
         print(json.dumps(preview, default=str, indent=2))
         sys.exit(0)
 
-    collection = get_collection(args.mongo_uri, args.db_name, args.collection_name)
-
-    if args.create_indexes:
+    collection = get_collection(args.mongo_uri, args.db_name, args.collection_name,
+                                write_concern=args.write_concern, compressors=args.compressors)
+
+    first_load = False
+    existing = collection.estimated_document_count() if (args.upsert or args.load_then_index) else 0
+    if args.load_then_index and existing:
+        # Re-inserting every row next to the stored copies would only make the
+        # post-load index build fail on the duplicates
+        logging.warning("Collection already holds ~%d documents: --load-then-index "
+                        "falls back to upserts.", existing)
+        args.load_then_index = False
+        args.upsert = True
+    elif args.load_then_index:
+        args.upsert = False
+    elif args.upsert and not existing:
+        # Nothing to match against: upserts would behave as (slower) inserts
+        logging.info("Collection is empty: first load, using plain inserts and "
+                     "building the unique index afterwards.")
+        args.upsert = False
+        first_load = True
+    # Upserts need the index to match existing documents. Plain inserts load
+    # faster without it, and the server then builds it with one sorted pass.
+    post_index = args.load_then_index or first_load or (args.create_indexes and not args.upsert)
+    if args.create_indexes and args.upsert:
         ensure_unique_index(collection)
+    if args.upsert and UNIQUE_INDEX_NAME in collection.index_information():
+        logging.warning("Upsert mode maintains the unique index on every write; "
+                        "expect a slower load than plain inserts.")
 
     logging.info("Mode: %s", "UPSERT" if args.upsert else "INSERT")
-    written = insert_or_upsert(collection, docs_iter, batch_size=args.batch_size, upsert=args.upsert)
+    docs_iter = iter_documents(args.csv_path, chunksize=args.chunksize, stats=stats,
+                               block_size=args.block_size, processes=args.processes, upsert=args.upsert)
+    written = insert_or_upsert(collection, docs_iter, batch_size=args.batch_size, upsert=args.upsert,
+                               workers=args.workers)
     append_report(args.report_path, args.csv_path, stats, written)
     logging.info("Written %d documents into %s.%s", written, args.db_name, args.collection_name)
 
+    if post_index:
+        ensure_unique_index(collection)
+
 if __name__ == "__main__":
     main()